@@ -8,3 +8,9 @@ from pyalertme.zbdevice import ZBDevice
 from pyalertme.zbsmartplug import ZBSmartPlug
 from pyalertme.zbsensor import ZBSensor
 
+from pyalertme.capture import FrameRecorder, FrameReplayer
+from pyalertme.registry import DeviceRegistry
+from pyalertme.outbound import OutboundQueue
+from pyalertme.eventbus import EventBus
+from pyalertme.changefeed import ChangeFeed
+from pyalertme.api import HubApi
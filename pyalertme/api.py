@@ -0,0 +1,419 @@
+import binascii
+import itertools
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    from urllib.parse import parse_qs
+except ImportError:
+    from urlparse import parse_qs
+
+from wsgiref.simple_server import make_server, WSGIServer, WSGIRequestHandler
+
+try:
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from SocketServer import ThreadingMixIn
+
+from pyalertme.changefeed import ChangeFeed
+from pyalertme.zbhub import device_commands
+
+http_statuses = {
+    200: '200 OK',
+    202: '202 Accepted',
+    304: '304 Not Modified',
+    400: '400 Bad Request',
+    404: '404 Not Found',
+    405: '405 Method Not Allowed',
+    500: '500 Internal Server Error'
+}
+
+
+class ApiError(Exception):
+    """
+    Error returned to the HTTP client.
+    """
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+class JobQueue(object):
+    """
+    Job Queue.
+    Device commands are run by a single worker thread, so an HTTP request
+    returns a job ID straight away rather than waiting on the radio.
+    """
+    def __init__(self, maxlen=1000):
+        """
+        Job Queue Constructor.
+
+        :param maxlen: Number of finished jobs kept for status queries
+        """
+        self._logger = logging.getLogger('pyalertme')
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._ids = itertools.count(1)
+        self._maxlen = maxlen
+        self._thread = None
+
+    def submit(self, description, func, *args):
+        """
+        Queue a function call.
+
+        :param description: Short description of the job
+        :param func: Function to call
+        :return: Job ID
+        """
+        job = {
+            'id': next(self._ids),
+            'description': description,
+            'status': 'queued',
+            'result': None,
+            'submitted': time.time(),
+            'finished': None
+        }
+        with self._lock:
+            self._jobs[job['id']] = job
+            while len(self._jobs) > self._maxlen:
+                self._jobs.popitem(last=False)
+        self._queue.put((job, func, args))
+
+        return job['id']
+
+    def get(self, job_id):
+        """
+        Return a copy of a job.
+
+        :param job_id: Job ID
+        :return: Dict of job, or None if unknown
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def start(self):
+        """
+        Start the worker thread.
+
+        """
+        self._thread = threading.Thread(target=self._worker)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def halt(self):
+        """
+        Stop the worker thread once queued jobs are done.
+
+        """
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _worker(self):
+        """
+        Worker Thread.
+
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            job, func, args = item
+            job['status'] = 'running'
+            try:
+                job['result'] = func(*args)
+                job['status'] = 'done'
+            except Exception as e:
+                self._logger.error('Job %s failed: %s', job['id'], e)
+                job['result'] = str(e)
+                job['status'] = 'failed'
+            job['finished'] = time.time()
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        logging.getLogger('pyalertme').debug('API %s', format % args)
+
+
+class HubApi(object):
+    """
+    HTTP API for a ZBHub.
+    A plain WSGI application, so it can be served by serve() or mounted in
+    any WSGI server.
+
+    GET  /devices?offset=0&limit=50          List devices (paginated, ETag)
+    GET  /devices/<id>                       Single device (ETag)
+    GET  /devices/<id>/history?attribute=x   Recent changes for a device
+    POST /devices/<id>/commands              {"command": "switch_state", "value": 1}, returns a job
+    POST /commands                           {"device_ids" or "group", "command", "value", "broadcast"}, returns a job
+    GET  /jobs/<id>                          Job status and result
+
+    ETags are taken from the change feed's sequence numbers, so an unchanged
+    device (or device list) is answered with 304 Not Modified.
+    """
+    def __init__(self, hub_obj, feed=None, history=None, base='/api/v1', page_size=50):
+        """
+        API Constructor.
+
+        :param hub_obj: ZBHub
+        :param feed: Optional ChangeFeed, one is created if not given
+        :param history: Optional history store with a query(device_id, attr_name, start, end) method
+        :param base: URL prefix
+        :param page_size: Default and maximum page size
+        """
+        self._logger = logging.getLogger('pyalertme')
+        self.hub_obj = hub_obj
+        self._own_feed = feed is None
+        self.feed = feed if feed else ChangeFeed(hub_obj)
+        self.history = history
+        self.base = base.rstrip('/')
+        self.page_size = page_size
+        self.jobs = JobQueue()
+        self.jobs.start()
+        self._server = None
+
+        self._routes = [
+            ('GET', re.compile(r'^/devices$'), self.list_devices),
+            ('GET', re.compile(r'^/devices/([0-9a-f:]+)$'), self.get_device),
+            ('GET', re.compile(r'^/devices/([0-9a-f:]+)/history$'), self.get_history),
+            ('POST', re.compile(r'^/devices/([0-9a-f:]+)/commands$'), self.device_command),
+            ('POST', re.compile(r'^/commands$'), self.bulk_command),
+            ('GET', re.compile(r'^/jobs/([0-9]+)$'), self.get_job)
+        ]
+
+    def serve(self, host='', port=8000):
+        """
+        Serve the API, one thread per request, until halt() is called.
+
+        :param host: Address to listen on
+        :param port: Port to listen on
+        """
+        self._server = make_server(host, port, self, _ThreadingWSGIServer, _QuietRequestHandler)
+        self._logger.info('API listening on %s:%s', host, self._server.server_port)
+        self._server.serve_forever()
+
+    def halt(self):
+        """
+        Stop serving and finish queued jobs.
+
+        """
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.jobs.halt()
+        if self._own_feed:
+            self.feed.close()
+
+    def __call__(self, environ, start_response):
+        """
+        WSGI Entry Point.
+
+        """
+        headers = [('Content-Type', 'application/json')]
+        try:
+            status, body, etag = self.dispatch(environ)
+            if etag:
+                headers.append(('ETag', etag))
+                if environ.get('HTTP_IF_NONE_MATCH') == etag:
+                    status, body = 304, None
+        except ApiError as e:
+            status, body = e.status, {'error': str(e)}
+        except Exception as e:
+            self._logger.error('API error: %s', e)
+            status, body = 500, {'error': 'Internal Server Error'}
+
+        payload = b'' if body is None else json.dumps(body, default=self._json_default).encode('utf-8')
+        headers.append(('Content-Length', str(len(payload))))
+        start_response(http_statuses[status], headers)
+
+        return [payload]
+
+    def dispatch(self, environ):
+        """
+        Route a request.
+
+        :param environ: WSGI environ
+        :return: Tuple of status, body and ETag (or None)
+        """
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(self.base):
+            raise ApiError(404, 'Not Found')
+        path = path[len(self.base):].rstrip('/')
+        method = environ.get('REQUEST_METHOD', 'GET')
+        query = parse_qs(environ.get('QUERY_STRING', ''))
+
+        path_found = False
+        for route_method, pattern, handler in self._routes:
+            match = pattern.match(path)
+            if match:
+                path_found = True
+                if route_method == method:
+                    return handler(environ, query, *match.groups())
+
+        raise ApiError(405 if path_found else 404, 'Method Not Allowed' if path_found else 'Not Found')
+
+    def list_devices(self, environ, query):
+        """
+        GET /devices
+        """
+        offset = self._int_param(query, 'offset', 0)
+        limit = min(self._int_param(query, 'limit', self.page_size), self.page_size)
+        device_ids = sorted(self.hub_obj.devices.keys())
+        page = [self.device_dict(self.hub_obj.devices[device_id]) for device_id in device_ids[offset:offset + limit]]
+        body = {
+            'devices': page,
+            'offset': offset,
+            'limit': limit,
+            'total': len(device_ids),
+            'next': offset + limit if offset + limit < len(device_ids) else None
+        }
+
+        return 200, body, '"%s-%s"' % (self.feed.seq, len(device_ids))
+
+    def get_device(self, environ, query, device_id):
+        """
+        GET /devices/<id>
+        """
+        device_obj = self._device_obj(device_id)
+
+        return 200, self.device_dict(device_obj), '"%s"' % self.feed.versions.get(device_id, 0)
+
+    def get_history(self, environ, query, device_id):
+        """
+        GET /devices/<id>/history
+        """
+        self._device_obj(device_id)
+        attr_name = query.get('attribute', [None])[0]
+        start = float(query.get('start', [0])[0])
+        end = float(query.get('end', [time.time()])[0])
+
+        if self.history and attr_name:
+            values = self.history.query(device_id, attr_name, start, end)
+        else:
+            # Without a history store only the changes still in the feed are available
+            values = []
+            ret = self.feed.since(0, [device_id], [attr_name] if attr_name else None)
+            for change in ret['changes']:
+                if start <= change['timestamp'] <= end:
+                    values.append({'timestamp': change['timestamp'], 'attributes': change['attributes']})
+
+        return 200, {'device_id': device_id, 'attribute': attr_name, 'history': values}, None
+
+    def device_command(self, environ, query, device_id):
+        """
+        POST /devices/<id>/commands
+        """
+        self._device_obj(device_id)
+        request = self._json_body(environ)
+        command, value = self._command(request)
+        job_id = self.jobs.submit('%s %s' % (command, device_id), self.hub_obj.call_devices_command,
+                                  [device_id], command, value)
+
+        return 202, {'job_id': job_id}, None
+
+    def bulk_command(self, environ, query):
+        """
+        POST /commands
+        """
+        request = self._json_body(environ)
+        command, value = self._command(request)
+        broadcast = bool(request.get('broadcast', False))
+
+        if 'group' in request:
+            if request['group'] not in self.hub_obj.groups:
+                raise ApiError(404, "Group '%s' does not exist" % request['group'])
+            job_id = self.jobs.submit('%s group %s' % (command, request['group']), self.hub_obj.call_group_command,
+                                      request['group'], command, value, 0.05, broadcast)
+        elif isinstance(request.get('device_ids'), list):
+            job_id = self.jobs.submit('%s %s devices' % (command, len(request['device_ids'])),
+                                      self.hub_obj.call_devices_command,
+                                      request['device_ids'], command, value, 0.05, broadcast)
+        else:
+            raise ApiError(400, 'Either group or device_ids is required')
+
+        return 202, {'job_id': job_id}, None
+
+    def get_job(self, environ, query, job_id):
+        """
+        GET /jobs/<id>
+        """
+        job = self.jobs.get(int(job_id))
+        if not job:
+            raise ApiError(404, 'Job %s does not exist' % job_id)
+
+        return 200, job, None
+
+    @staticmethod
+    def device_dict(device_obj):
+        """
+        Public device attributes, with addresses as hex strings.
+
+        :param device_obj: Node
+        :return: Dictionary of attributes
+        """
+        device = {'id': device_obj.id}
+        for attr_name, attr_value in device_obj.__dict__.items():
+            if attr_name.startswith('_'):
+                continue
+            if attr_name.endswith(('addr_long', 'addr_short')):
+                attr_value = binascii.hexlify(attr_value).decode()
+            device[attr_name] = attr_value
+
+        return device
+
+    def _device_obj(self, device_id):
+        device_obj = self.hub_obj.device_obj_from_id(device_id)
+        if not device_obj:
+            raise ApiError(404, 'Device %s does not exist' % device_id)
+        return device_obj
+
+    @staticmethod
+    def _command(request):
+        command = request.get('command')
+        if command not in device_commands or 'value' not in request:
+            raise ApiError(400, 'A valid command and value are required')
+        return command, request['value']
+
+    @staticmethod
+    def _int_param(query, name, default):
+        try:
+            value = int(query.get(name, [default])[0])
+        except ValueError:
+            raise ApiError(400, 'Invalid %s' % name)
+        if value < 0:
+            raise ApiError(400, 'Invalid %s' % name)
+        return value
+
+    @staticmethod
+    def _json_body(environ):
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+            body = json.loads(environ['wsgi.input'].read(length).decode('utf-8'))
+        except (ValueError, KeyError):
+            raise ApiError(400, 'Invalid JSON')
+        if not isinstance(body, dict):
+            raise ApiError(400, 'Invalid JSON')
+        return body
+
+    @staticmethod
+    def _json_default(value):
+        if isinstance(value, bytes):
+            return binascii.hexlify(value).decode()
+        raise TypeError(repr(value))
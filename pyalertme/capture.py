@@ -0,0 +1,304 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+# Capture File Header
+CAPTURE_MAGIC = b'PYAMCAP\x01'
+
+# Record Directions
+DIRECTION_RX = 0
+DIRECTION_TX = 1
+
+# XBee API Frame Types we know how to capture
+FRAME_TYPE_TX_EXPLICIT = 0x11
+FRAME_TYPE_AT_RESPONSE = 0x88
+FRAME_TYPE_RX_EXPLICIT = 0x91
+
+frame_types = {
+    'tx_explicit': FRAME_TYPE_TX_EXPLICIT,
+    'at_response': FRAME_TYPE_AT_RESPONSE,
+    'rx_explicit': FRAME_TYPE_RX_EXPLICIT
+}
+
+# Record Flags, marking optional message keys which were present
+FLAG_OPTIONS = 0x01   # rx_explicit 'options'
+FLAG_STATUS = 0x02    # at_response 'status'
+FLAG_FRAME_ID = 0x04  # at_response 'frame_id'
+
+# Fixed size record header, see FrameRecorder for the layout.
+RECORD_HEADER = struct.Struct('<dBBB8s2s2s2ssssH')
+
+
+class FrameRecorder(object):
+    """
+    Frame Recorder.
+    Appends received and sent frames to a compact binary capture file.
+
+    The file starts with an 8 byte header (b'PYAMCAP\x01') followed by records:
+
+    Field Name                 Size       Description
+    ----------                 ----       -----------
+    Timestamp                  8          Epoch seconds (double)
+    Direction                  1          0 = Received, 1 = Sent
+    Frame Type                 1          XBee API Frame Type (0x91 rx_explicit, 0x11 tx_explicit, 0x88 at_response)
+    Flags                      1          Optional keys present (0x01 options, 0x02 status, 0x04 frame_id)
+    Long Address               8          Source (received) or destination (sent) 64-bit address
+    Short Address              2          Source (received) or destination (sent) 16-bit address
+    Profile ID                 2          Profile ID
+    Cluster ID                 2          Cluster ID (AT Command for at_response)
+    Source Endpoint            1          Source Endpoint (AT Status for at_response)
+    Destination Endpoint       1          Destination Endpoint (AT Frame ID for at_response)
+    Options                    1          Receive Options
+    Length                     2          Length of the data which follows
+    Data                       Variable   rf_data (AT Parameter for at_response)
+
+    Recording errors are logged rather than raised, so a full disk never
+    breaks frame reception. Once closed the recorder silently ignores frames.
+    """
+    def __init__(self, filename):
+        """
+        Recorder Constructor.
+
+        :param filename: Capture file, appended to if it already exists
+        """
+        self._logger = logging.getLogger('pyalertme')
+        self._lock = threading.Lock()
+        self._file = open(filename, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(CAPTURE_MAGIC)
+        self._closed = False
+        self.frames = 0
+
+    def record_received(self, message):
+        """
+        Record a frame received from the XBee.
+
+        :param message: Dict of message
+        """
+        frame_type = frame_types.get(message['id'])
+        if frame_type == FRAME_TYPE_RX_EXPLICIT:
+            flags = FLAG_OPTIONS if 'options' in message else 0
+            self._write(
+                DIRECTION_RX, frame_type, flags,
+                message['source_addr_long'], message['source_addr'],
+                message['profile'], message['cluster'],
+                message['source_endpoint'], message['dest_endpoint'],
+                message.get('options', b'\x00'), message['rf_data']
+            )
+        elif frame_type == FRAME_TYPE_AT_RESPONSE:
+            flags = (FLAG_STATUS if 'status' in message else 0) | (FLAG_FRAME_ID if 'frame_id' in message else 0)
+            command = message['command']
+            if not isinstance(command, bytes):
+                command = command.encode('ascii')
+            self._write(
+                DIRECTION_RX, frame_type, flags,
+                b'', b'', b'', command,
+                message.get('status', b'\x00'), message.get('frame_id', b'\x00'), b'\x00',
+                message.get('parameter') or b''
+            )
+        else:
+            self._logger.debug('Not capturing frame type %s', message['id'])
+
+    def record_sent(self, message):
+        """
+        Record a tx_explicit frame sent to the XBee.
+
+        :param message: Dict message, with destination addresses
+        """
+        self._write(
+            DIRECTION_TX, FRAME_TYPE_TX_EXPLICIT, 0,
+            message['dest_addr_long'], message['dest_addr'],
+            message['profile'], message['cluster'],
+            message['src_endpoint'], message['dest_endpoint'],
+            b'\x00', message['data']
+        )
+
+    def _write(self, direction, frame_type, flags, addr_long, addr_short, profile, cluster,
+               src_endpoint, dest_endpoint, options, data):
+        """
+        Pack and write a single record.
+        """
+        header = RECORD_HEADER.pack(
+            time.time(), direction, frame_type, flags, addr_long, addr_short, profile, cluster,
+            src_endpoint, dest_endpoint, options, len(data)
+        )
+        with self._lock:
+            if self._closed:
+                return
+            try:
+                self._file.write(header)
+                self._file.write(data)
+                self.frames += 1
+            except (IOError, OSError, ValueError) as e:
+                self._logger.error('Unable to write capture record: %s', e)
+
+    def flush(self):
+        """
+        Flush buffered records to disk.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            try:
+                self._file.flush()
+            except (IOError, OSError) as e:
+                self._logger.error('Unable to flush capture file: %s', e)
+
+    def close(self):
+        """
+        Flush and close the capture file.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            try:
+                self._file.close()
+            except (IOError, OSError) as e:
+                self._logger.error('Unable to close capture file: %s', e)
+
+
+class FrameReplayer(object):
+    """
+    Frame Replayer.
+    Memory maps a capture file written by FrameRecorder and feeds the
+    frames back into a node's receive_message().
+    """
+    def __init__(self, filename):
+        """
+        Replayer Constructor.
+
+        :param filename: Capture file
+        """
+        self._logger = logging.getLogger('pyalertme')
+        self._file = open(filename, 'rb')
+        if os.fstat(self._file.fileno()).st_size < len(CAPTURE_MAGIC):
+            self._file.close()
+            raise Exception("Not a PyAlertMe capture file: %s" % filename)
+
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[0:len(CAPTURE_MAGIC)] != CAPTURE_MAGIC:
+            self.close()
+            raise Exception("Not a PyAlertMe capture file: %s" % filename)
+
+        try:
+            self._view = memoryview(self._mmap)
+        except TypeError:
+            # Python 2 mmap only supports the old buffer interface
+            self._view = None
+
+    def records(self):
+        """
+        Iterate over the records in the capture file.
+        Headers are unpacked in place and data is returned as a view
+        onto the mapped file, nothing is copied until the frame is used.
+
+        :return: Generator of (timestamp, direction, frame_type, flags, addr_long, addr_short,
+                 profile, cluster, src_endpoint, dest_endpoint, options, data)
+        """
+        offset = len(CAPTURE_MAGIC)
+        size = len(self._mmap)
+        while offset + RECORD_HEADER.size <= size:
+            header = RECORD_HEADER.unpack_from(self._mmap, offset)
+            start = offset + RECORD_HEADER.size
+            length = header[-1]
+            if start + length > size:
+                self._logger.warning('Truncated capture record at offset %s', offset)
+                break
+
+            if self._view is not None:
+                data = self._view[start:start + length]
+            else:
+                data = buffer(self._mmap, start, length)
+
+            yield header[:-1] + (data,)
+            offset = start + length
+
+    @staticmethod
+    def to_message(record):
+        """
+        Rebuild a received message dictionary from a capture record.
+        Optional keys are only included if they were in the recorded message.
+
+        :param record: Record tuple as returned by records()
+        :return: Dict of message
+        """
+        (timestamp, direction, frame_type, flags, addr_long, addr_short, profile, cluster,
+         src_endpoint, dest_endpoint, options, data) = record
+
+        if frame_type == FRAME_TYPE_AT_RESPONSE:
+            command = cluster if isinstance(cluster, str) else cluster.decode('ascii')
+            message = {
+                'id': 'at_response',
+                'command': command,
+                'parameter': bytes(data)
+            }
+            if flags & FLAG_STATUS:
+                message['status'] = src_endpoint
+            if flags & FLAG_FRAME_ID:
+                message['frame_id'] = dest_endpoint
+            return message
+
+        message = {
+            'id': 'rx_explicit',
+            'source_addr_long': addr_long,
+            'source_addr': addr_short,
+            'source_endpoint': src_endpoint,
+            'dest_endpoint': dest_endpoint,
+            'profile': profile,
+            'cluster': cluster,
+            'rf_data': bytes(data)
+        }
+        if flags & FLAG_OPTIONS:
+            message['options'] = options
+        return message
+
+    def replay(self, node_obj, speed=1.0):
+        """
+        Replay received frames into a node.
+
+        :param node_obj: Node (usually a ZBHub) to feed with receive_message()
+        :param speed: 1.0 for real time, N for N times real time, None or 0 for as fast as possible
+        :return: Dictionary of throughput stats
+        """
+        frames = 0
+        data_bytes = 0
+        first_timestamp = None
+        started = time.time()
+
+        for record in self.records():
+            if record[1] != DIRECTION_RX:
+                continue
+
+            if speed:
+                if first_timestamp is None:
+                    first_timestamp = record[0]
+                delay = started + (record[0] - first_timestamp) / speed - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+
+            node_obj.receive_message(self.to_message(record))
+            frames += 1
+            data_bytes += len(record[-1])
+
+        elapsed = time.time() - started
+        stats = {
+            'frames': frames,
+            'bytes': data_bytes,
+            'elapsed': elapsed,
+            'frames_per_sec': frames / elapsed if elapsed > 0 else float(frames)
+        }
+        self._logger.info('Replayed %s frames in %.3fs (%.1f frames/s)', frames, elapsed, stats['frames_per_sec'])
+
+        return stats
+
+    def close(self):
+        """
+        Close the capture file.
+        """
+        self._view = None
+        self._mmap.close()
+        self._file.close()
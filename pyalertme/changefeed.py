@@ -0,0 +1,126 @@
+import logging
+import threading
+from collections import deque
+
+
+class ChangeFeed(object):
+    """
+    Change Feed.
+    Subscribes to a hub's event bus and numbers every attribute change-set
+    with an increasing sequence number. The most recent change-sets are kept
+    in a ring buffer so a client which reconnects can resume from the last
+    sequence number it saw, rather than polling the full device list.
+
+    Also keeps the sequence number of the latest change for each device,
+    which can be used as a cheap version (e.g. for HTTP ETags).
+    """
+    def __init__(self, hub_obj=None, maxlen=1000):
+        """
+        Change Feed Constructor.
+
+        :param hub_obj: Optional ZBHub to subscribe to
+        :param maxlen: Number of change-sets kept for resuming
+        """
+        self._logger = logging.getLogger('pyalertme')
+        self._condition = threading.Condition()
+        self._changes = deque(maxlen=maxlen)
+        self.seq = 0
+        self.versions = {}
+
+        self._hub_obj = hub_obj
+        self._subscription = None
+        if hub_obj:
+            # Keep every change, the feed's own ring buffer decides what is kept.
+            self._subscription = hub_obj.subscribe(self.append, maxlen=maxlen, policy='latest')
+
+    def close(self):
+        """
+        Unsubscribe from the hub and wake any waiting readers.
+
+        """
+        if self._subscription:
+            self._hub_obj.unsubscribe(self._subscription)
+            self._subscription = None
+        with self._condition:
+            self._condition.notify_all()
+
+    def append(self, event):
+        """
+        Add a change-set to the feed.
+
+        :param event: Event dict from the event bus (device_id, cluster, attributes, timestamp)
+        :return: Sequence number
+        """
+        with self._condition:
+            self.seq += 1
+            change = dict(event, seq=self.seq)
+            self._changes.append(change)
+            self.versions[event['device_id']] = self.seq
+            self._condition.notify_all()
+
+        return change['seq']
+
+    def since(self, seq, device_ids=None, attributes=None):
+        """
+        Return change-sets after a sequence number.
+
+        If changes after seq have already been dropped from the ring buffer the
+        client has missed updates, 'reset' is True and it should reload the full
+        device state before carrying on from the returned 'seq'.
+
+        :param seq: Last sequence number seen, 0 for everything still held
+        :param device_ids: Optional list of Dotted MAC Addresses
+        :param attributes: Optional list of attribute names
+        :return: Dictionary of 'changes', latest 'seq' and 'reset'
+        """
+        with self._condition:
+            changes = [change for change in self._changes if change['seq'] > seq]
+            oldest = self._changes[0]['seq'] if self._changes else self.seq + 1
+            latest = self.seq
+
+        reset = seq > 0 and seq + 1 < oldest
+        return {
+            'changes': self._filter(changes, device_ids, attributes),
+            'seq': latest,
+            'reset': reset
+        }
+
+    def wait(self, seq, timeout=None, device_ids=None, attributes=None):
+        """
+        As since(), but block until there is a change after seq or the timeout expires.
+
+        :param seq: Last sequence number seen
+        :param timeout: Seconds to wait, None to wait forever
+        :param device_ids: Optional list of Dotted MAC Addresses
+        :param attributes: Optional list of attribute names
+        :return: Dictionary of 'changes', latest 'seq' and 'reset'
+        """
+        with self._condition:
+            if self.seq <= seq:
+                self._condition.wait(timeout)
+
+        return self.since(seq, device_ids, attributes)
+
+    @staticmethod
+    def _filter(changes, device_ids=None, attributes=None):
+        """
+        Filter change-sets by device and attribute.
+
+        :param changes: List of change-sets
+        :param device_ids: Optional list of Dotted MAC Addresses
+        :param attributes: Optional list of attribute names
+        :return: List of change-sets
+        """
+        filtered = []
+        for change in changes:
+            if device_ids and change['device_id'] not in device_ids:
+                continue
+            if attributes:
+                change_attributes = dict((attr_name, attr_value) for attr_name, attr_value in change['attributes'].items()
+                                         if attr_name in attributes)
+                if not change_attributes:
+                    continue
+                change = dict(change, attributes=change_attributes)
+            filtered.append(change)
+
+        return filtered
@@ -0,0 +1,211 @@
+import logging
+import threading
+import time
+from collections import deque
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# Subscriber Overflow Policies
+POLICY_DROP = 'drop'      # Queue full, drop the new event
+POLICY_LATEST = 'latest'  # Queue full, drop the oldest event so the latest is kept
+
+
+class Subscription(object):
+    """
+    Event Bus Subscription.
+    A subscriber callback, its filters and its bounded queue of pending events.
+    """
+    def __init__(self, callback, device_ids=None, attributes=None, clusters=None, maxlen=100, policy=POLICY_DROP):
+        """
+        Subscription Constructor.
+
+        :param callback: Function called with each event dict
+        :param device_ids: Optional list of Dotted MAC Addresses to receive events for
+        :param attributes: Optional list of attribute names to receive events for
+        :param clusters: Optional list of Cluster IDs to receive events for
+        :param maxlen: Maximum number of pending events
+        :param policy: 'drop' or 'latest', what to do when the queue is full
+        """
+        if policy not in (POLICY_DROP, POLICY_LATEST):
+            raise Exception("Invalid Policy '%s'" % policy)
+
+        self.callback = callback
+        self.device_ids = set(device_ids) if device_ids else None
+        self.attributes = set(attributes) if attributes else None
+        self.clusters = set(clusters) if clusters else None
+        self.maxlen = maxlen
+        self.policy = policy
+
+        self._events = deque()
+        self._scheduled = False
+
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def matches(self, event):
+        """
+        Check whether an event passes this subscription's filters.
+
+        :param event: Event dict
+        :return: Event to deliver, with attributes narrowed to the filter, or None
+        """
+        if self.device_ids is not None and event['device_id'] not in self.device_ids:
+            return None
+        if self.clusters is not None and event['cluster'] not in self.clusters:
+            return None
+        if self.attributes is not None:
+            attributes = dict((attr_name, attr_value) for attr_name, attr_value in event['attributes'].items()
+                              if attr_name in self.attributes)
+            if not attributes:
+                return None
+            event = dict(event, attributes=attributes)
+
+        return event
+
+    def pending(self):
+        """
+        Number of events waiting to be delivered.
+
+        :return: Count
+        """
+        return len(self._events)
+
+
+class EventBus(object):
+    """
+    Event Bus.
+    Publishes attribute change events to any number of subscribers.
+
+    publish() only filters the event and appends it to each matching
+    subscriber's bounded queue, so the XBee reader thread never waits on a
+    subscriber. A pool of worker threads delivers the events. Each subscriber
+    is handled by at most one worker at a time, so it sees its events in order,
+    while a slow subscriber only holds up its own queue.
+    """
+    def __init__(self, workers=2):
+        """
+        Event Bus Constructor.
+
+        :param workers: Number of worker threads delivering events
+        """
+        self._logger = logging.getLogger('pyalertme')
+        self._lock = threading.Lock()
+        self._subscriptions = []
+        self._ready = queue.Queue()
+        self._workers = workers
+        self._threads = []
+
+        self.published = 0
+
+    def subscribe(self, callback, device_ids=None, attributes=None, clusters=None, maxlen=100, policy=POLICY_DROP):
+        """
+        Subscribe to events. See Subscription for the parameters.
+
+        :return: Subscription, pass to unsubscribe()
+        """
+        subscription = Subscription(callback, device_ids, attributes, clusters, maxlen, policy)
+        with self._lock:
+            self._subscriptions.append(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Remove a subscription, any pending events are discarded.
+
+        :param subscription: Subscription returned by subscribe()
+        """
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+            subscription._events.clear()
+
+    def publish(self, device_id, attributes, cluster=None):
+        """
+        Publish attribute changes to all matching subscribers.
+
+        :param device_id: Dotted MAC Address
+        :param attributes: Dict of attributes which changed
+        :param cluster: Optional Cluster ID the attributes arrived on
+        """
+        event = {
+            'device_id': device_id,
+            'cluster': cluster,
+            'attributes': attributes,
+            'timestamp': time.time()
+        }
+
+        with self._lock:
+            self.published += 1
+            for subscription in self._subscriptions:
+                matched = subscription.matches(event)
+                if matched is None:
+                    continue
+
+                if len(subscription._events) >= subscription.maxlen:
+                    subscription.dropped += 1
+                    if subscription.policy == POLICY_DROP:
+                        continue
+                    subscription._events.popleft()
+                subscription._events.append(matched)
+
+                if not subscription._scheduled:
+                    subscription._scheduled = True
+                    self._ready.put(subscription)
+
+    def start(self):
+        """
+        Start the worker threads.
+
+        """
+        for i in range(self._workers):
+            thread = threading.Thread(target=self._worker)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def halt(self):
+        """
+        Stop the worker threads, once they have delivered what is already queued.
+
+        """
+        for thread in self._threads:
+            self._ready.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _worker(self):
+        """
+        Worker Thread.
+
+        """
+        while True:
+            subscription = self._ready.get()
+            if subscription is None:
+                break
+            self._deliver(subscription)
+
+    def _deliver(self, subscription):
+        """
+        Deliver all of a subscriber's pending events.
+
+        :param subscription: Subscription
+        """
+        while True:
+            with self._lock:
+                if not subscription._events:
+                    subscription._scheduled = False
+                    return
+                event = subscription._events.popleft()
+
+            try:
+                subscription.callback(event)
+                subscription.delivered += 1
+            except Exception as e:
+                subscription.errors += 1
+                self._logger.error('Event subscriber error: %s', e)
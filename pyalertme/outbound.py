@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+
+class OutboundQueue(object):
+    """
+    Outbound Command Queue.
+    Holds at most one pending command per (device, message type). Submitting
+    a command which is already pending replaces the pending message in place,
+    so the radio only ever carries the latest requested state. A sender thread
+    drains the queue in order, leaving at least interval seconds between frames.
+
+    Also tracks join handshakes (mode change and version requests) so they are
+    only re-sent to a device once the cooldown has passed.
+    """
+    def __init__(self, send_func, interval=0.05, handshake_cooldown=10):
+        """
+        Outbound Queue Constructor.
+
+        :param send_func: Function to send a message, e.g. ZBNode.send_message
+        :param interval: Minimum seconds between frames
+        :param handshake_cooldown: Seconds before a handshake is re-sent to the same device
+        """
+        self._logger = logging.getLogger('pyalertme')
+        self._send_func = send_func
+        self.interval = interval
+        self.handshake_cooldown = handshake_cooldown
+
+        self._pending = OrderedDict()
+        self._condition = threading.Condition()
+        self._handshakes = {}
+        self._started = False
+        self._thread = None
+
+        self.sent = 0
+        self.coalesced = 0
+
+    def submit(self, message_id, message, dest_addr_long, dest_addr_short):
+        """
+        Queue message to be sent, replacing any pending message of the same
+        type for the same device.
+
+        :param message_id: Message ID, e.g. 'switch_state_request'
+        :param message: Dict message
+        :param dest_addr_long: 48-bits Long Address
+        :param dest_addr_short: 16-bit Short Address
+        """
+        key = (dest_addr_long, message_id)
+        with self._condition:
+            if key in self._pending:
+                self._logger.debug('Coalescing %s', message_id)
+                self.coalesced += 1
+            self._pending[key] = (message, dest_addr_long, dest_addr_short)
+            self._condition.notify()
+
+    def discard(self, message_id, dest_addr_long):
+        """
+        Drop a pending message, e.g. because a newer one has been sent directly.
+
+        :param message_id: Message ID
+        :param dest_addr_long: 48-bits Long Address
+        """
+        with self._condition:
+            self._pending.pop((dest_addr_long, message_id), None)
+
+    def handshake_due(self, dest_addr_long):
+        """
+        Check whether a join handshake should be sent to this device, and if
+        so start the cooldown.
+
+        :param dest_addr_long: 48-bits Long Address
+        :return: True if the handshake should be sent
+        """
+        now = time.time()
+        with self._condition:
+            last_sent = self._handshakes.get(dest_addr_long)
+            if last_sent and now - last_sent < self.handshake_cooldown:
+                return False
+            self._handshakes[dest_addr_long] = now
+            return True
+
+    def handshake_complete(self, dest_addr_long):
+        """
+        Forget handshake for a device which has now joined.
+
+        :param dest_addr_long: 48-bits Long Address
+        """
+        with self._condition:
+            self._handshakes.pop(dest_addr_long, None)
+
+    def pending(self):
+        """
+        Number of messages waiting to be sent.
+
+        :return: Count
+        """
+        with self._condition:
+            return len(self._pending)
+
+    def start(self):
+        """
+        Start the sender thread.
+
+        """
+        self._started = True
+        self._thread = threading.Thread(target=self._send_loop)
+        self._thread.start()
+
+    def halt(self):
+        """
+        Stop the sender thread, sending anything still pending.
+
+        """
+        with self._condition:
+            self._started = False
+            self._condition.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def flush(self):
+        """
+        Send all pending messages now.
+
+        """
+        while self._send_next():
+            pass
+
+    def _send_loop(self):
+        """
+        Sender Thread.
+
+        """
+        while True:
+            with self._condition:
+                while self._started and not self._pending:
+                    self._condition.wait()
+                if not self._started:
+                    break
+            self._send_next()
+            time.sleep(self.interval)
+
+    def _send_next(self):
+        """
+        Send the oldest pending message.
+
+        :return: True if a message was sent
+        """
+        with self._condition:
+            if not self._pending:
+                return False
+            key, (message, dest_addr_long, dest_addr_short) = self._pending.popitem(last=False)
+
+        try:
+            self._send_func(message, dest_addr_long, dest_addr_short)
+            self.sent += 1
+        except Exception as e:
+            self._logger.error('Unable to send %s: %s', key[1], e)
+
+        return True
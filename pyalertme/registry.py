@@ -0,0 +1,214 @@
+import logging
+import binascii
+import json
+import os
+import threading
+from pyalertme.node import Node
+
+# Attributes which are runtime state and never persisted
+TRANSIENT_ATTRIBUTES = ['addr_long', 'addr_short', 'hub_addr_long', 'hub_addr_short', 'associated']
+
+
+class DeviceRegistry(object):
+    """
+    Device Registry.
+    Checkpoints the hub's known devices to a local journal file so a restarted
+    hub can pick up where it left off without re-handshaking every device.
+
+    The journal is a file of JSON lines, one line per device checkpoint. Only
+    devices which changed since the last flush are appended, the last line for
+    a device wins on load, and the journal is compacted on load and once it
+    grows well beyond the number of devices.
+
+    update() only marks a device as changed, the writes are done every
+    flush_interval seconds by the registry's own flush thread (see start())
+    so no file I/O happens on the XBee reader thread.
+    """
+    def __init__(self, filename, flush_interval=5, compact_threshold=1000):
+        """
+        Registry Constructor.
+
+        :param filename: Journal file
+        :param flush_interval: Seconds between incremental writes
+        :param compact_threshold: Journal lines beyond the device count before compacting
+        """
+        self._logger = logging.getLogger('pyalertme')
+        self.filename = filename
+        self.flush_interval = flush_interval
+        self.compact_threshold = compact_threshold
+
+        self._lock = threading.RLock()
+        self._records = {}
+        self._dirty = {}
+        self._lines = 0
+        self._stop = threading.Event()
+        self._flush_thread = None
+
+    @staticmethod
+    def to_record(device_obj):
+        """
+        Convert Device Object to a JSON serialisable record.
+
+        :param device_obj: Device Object
+        :return: Dictionary record
+        """
+        attributes = {}
+        for attr_name, attr_value in device_obj.__dict__.items():
+            if attr_name.startswith('_') or attr_name in TRANSIENT_ATTRIBUTES or attr_value is None:
+                continue
+            try:
+                json.dumps(attr_value)
+            except (TypeError, ValueError):
+                continue
+            attributes[attr_name] = attr_value
+
+        return {
+            'id': device_obj.id,
+            'addr_long': binascii.hexlify(device_obj.addr_long).decode(),
+            'addr_short': binascii.hexlify(device_obj.addr_short or b'').decode(),
+            'attributes': attributes
+        }
+
+    @staticmethod
+    def from_record(record):
+        """
+        Convert record back into a Device Object.
+
+        :param record: Dictionary record
+        :return: Device Object
+        """
+        device_obj = Node()
+        device_obj.addr_long = binascii.unhexlify(record['addr_long'])
+        device_obj.addr_short = binascii.unhexlify(record['addr_short'])
+        for attr_name, attr_value in record['attributes'].items():
+            device_obj.__setattr__(str(attr_name), attr_value)
+        device_obj.associated = True
+
+        return device_obj
+
+    def load(self):
+        """
+        Load devices from the journal and compact it.
+
+        :return: Dictionary of Device Objects keyed by Device ID
+        """
+        self._records = {}
+        if os.path.exists(self.filename):
+            with open(self.filename) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Most likely a partial line from an unclean shutdown
+                        self._logger.warning('Skipping corrupt registry line')
+                        continue
+                    if record.get('deleted'):
+                        self._records.pop(record['id'], None)
+                    else:
+                        self._records[record['id']] = record
+        self.compact()
+
+        devices = {}
+        for device_id, record in self._records.items():
+            devices[device_id] = self.from_record(record)
+        self._logger.info('Loaded %s devices from registry', len(devices))
+
+        return devices
+
+    def update(self, device_obj):
+        """
+        Mark device as changed, it will be written out on the next flush.
+
+        :param device_obj: Device Object
+        """
+        with self._lock:
+            self._dirty[device_obj.id] = device_obj
+
+    def remove(self, device_id):
+        """
+        Remove device from the registry.
+
+        :param device_id: Dotted MAC Address
+        """
+        with self._lock:
+            self._dirty.pop(device_id, None)
+            if self._records.pop(device_id, None):
+                self._append([{'id': device_id, 'deleted': True}])
+
+    def flush(self):
+        """
+        Append changed devices to the journal.
+
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            records = []
+            for device_id, device_obj in dirty.items():
+                record = self.to_record(device_obj)
+                if self._records.get(device_id) != record:
+                    self._records[device_id] = record
+                    records.append(record)
+            self._append(records)
+
+            if self._lines > len(self._records) + self.compact_threshold:
+                self.compact()
+
+    def compact(self):
+        """
+        Rewrite the journal with a single line per device.
+
+        """
+        with self._lock:
+            tmp_file = self.filename + '.tmp'
+            with open(tmp_file, 'w') as f:
+                for record in self._records.values():
+                    f.write(json.dumps(record) + '\n')
+            os.rename(tmp_file, self.filename)
+            self._lines = len(self._records)
+
+    def start(self):
+        """
+        Start the flush thread, writing out changes every flush_interval seconds.
+
+        """
+        if self._flush_thread:
+            return
+        self._stop.clear()
+        self._flush_thread = threading.Thread(target=self._flush_loop)
+        self._flush_thread.daemon = True
+        self._flush_thread.start()
+
+    def _flush_loop(self):
+        """
+        Flush Thread.
+
+        """
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except (IOError, OSError) as e:
+                self._logger.error('Unable to write registry %s: %s', self.filename, e)
+
+    def close(self):
+        """
+        Stop the flush thread and flush any outstanding changes.
+
+        """
+        if self._flush_thread:
+            self._stop.set()
+            self._flush_thread.join()
+            self._flush_thread = None
+        self.flush()
+
+    def _append(self, records):
+        """
+        Append records to the journal.
+
+        :param records: List of records
+        """
+        if not records:
+            return
+        with open(self.filename, 'a') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+        self._lines += len(records)
@@ -6,14 +6,15 @@ class ZBDevice(ZBNode):
     """
     ZigBee Device object.
     """
-    def __init__(self, serial, callback=None):
+    def __init__(self, serial, callback=None, address_cache=None):
         """
         Device Constructor.
 
         :param serial: Serial Object
         :param callback: Optional
+        :param address_cache: Optional JSON file caching own addresses by serial port
         """
-        ZBNode.__init__(self, serial, callback)
+        ZBNode.__init__(self, serial, callback, address_cache)
 
         # Type Info
         self.type = 'ZBDevice'
@@ -33,13 +34,14 @@ class ZBDevice(ZBNode):
         self.power_demand = 0
         self.power_consumption = 0
 
-    def process_message(self, addr_long, addr_short, attributes):
+    def process_message(self, addr_long, addr_short, attributes, cluster_id=None):
         """
         Process after message received.
 
         :param addr_long: Short Address
         :param addr_short: Long Address
         :param attributes: Dict of message
+        :param cluster_id: Cluster ID the message arrived on
         :return:
         """
         self.set_attributes(attributes)
@@ -1,21 +1,48 @@
 import logging
 from pyalertme.zbnode import *
+from pyalertme.outbound import OutboundQueue
+from pyalertme.eventbus import EventBus
 import time
 import threading
 
+# Device commands available to call_device_command() and the bulk commands,
+# with the message used to send them.
+device_commands = {
+    'switch_state': 'switch_state_request',
+    'mode': 'mode_change_request'
+}
+
 
 class ZBHub(ZBNode):
     """
     ZigBee Hub object.
     """
-    def __init__(self, serial, callback=None):
+    def __init__(self, serial, callback=None, address_cache=None, registry=None):
         """
         Hub Constructor.
 
         :param serial: Serial Object
         :param callback: Optional
+        :param address_cache: Optional JSON file caching own addresses by serial port
+        :param registry: Optional DeviceRegistry to restore and checkpoint known devices
         """
-        ZBNode.__init__(self, serial, callback)
+        # List of Known Devices and optional Device Registry (see registry.py).
+        # These are set up before the XBee reader is started so no frame
+        # can arrive before the known devices are restored.
+        self.devices = {}
+        self._registry = None
+        if registry:
+            self.set_registry(registry)
+
+        # Outbound commands are coalesced per device and message type (see outbound.py)
+        self._outbound = OutboundQueue(self.send_message)
+
+        # Device attribute changes are published to subscribers (see eventbus.py)
+        self.events = EventBus()
+        self.events.start()
+
+        ZBNode.__init__(self, serial, callback, address_cache)
+        self._outbound.start()
 
         # Type Info
         self.type = 'ZBHub'
@@ -23,9 +50,50 @@ class ZBHub(ZBNode):
         self.manu_string = 'PyAlertMe'
         self.manu_date = '2017-01-01'
 
-        # Discovery Thread and List of Known Devices
+        # Discovery Thread
         self._discovery_thread = threading.Thread(target=self._discovery)
-        self.devices = {}
+
+        # Named Device Groups, lists of Device IDs
+        self.groups = {}
+
+    def halt(self):
+        """
+        Halt Hub.
+        Send any pending commands, close XBee and Serial, deliver any pending
+        events and flush the device registry.
+
+        """
+        self._outbound.halt()
+        ZBNode.halt(self)
+        self.events.halt()
+        if self._registry:
+            self._registry.close()
+
+    def set_registry(self, registry):
+        """
+        Set Device Registry.
+        Devices saved in the registry are restored as known, associated devices
+        and any further device changes are checkpointed to it. Prefer passing the
+        registry to the constructor, so devices are restored before any frames
+        are received.
+
+        :param registry: DeviceRegistry
+        """
+        for device_id, restored_obj in registry.load().items():
+            device_obj = self.devices.get(device_id)
+            if device_obj:
+                # Already heard from this device, keep the live object and only
+                # fill in what we have not learnt since.
+                for attr_name, attr_value in restored_obj.__dict__.items():
+                    if not attr_name.startswith('_') and device_obj.__dict__.get(attr_name) is None:
+                        device_obj.__setattr__(attr_name, attr_value)
+                device_obj.associated = True
+                registry.update(device_obj)
+            else:
+                self.devices[device_id] = restored_obj
+
+        self._registry = registry
+        registry.start()
 
     def discovery(self):
         """
@@ -122,9 +190,13 @@ class ZBHub(ZBNode):
                 device_obj.addr_long = device_addr_long
                 device_obj.addr_short = device_addr_short
                 self.devices[device_id] = device_obj
+                if self._registry:
+                    self._registry.update(device_obj)
 
-            if not device_obj.type:
+            if not device_obj.type and self._outbound.handshake_due(device_addr_long):
                 # The device has to receive these two messages to stay joined.
+                # Only sent once per cooldown, not on every frame until the
+                # version response arrives.
                 message = self.generate_message('mode_change_request', {'mode': 'normal'})
                 self.send_message(message, device_addr_long, device_addr_short)
                 message = self.generate_message('version_info_request')
@@ -136,50 +208,84 @@ class ZBHub(ZBNode):
 
         return device_obj
 
-    def process_message(self, addr_long, addr_short, attributes):
+    def process_message(self, addr_long, addr_short, attributes, cluster_id=None):
         """
         Process after message received.
 
         :param addr_long: Short Address
         :param addr_short: Long Address
         :param attributes: Dict of message
+        :param cluster_id: Cluster ID the message arrived on
         :return:
         """
         device_obj = self.device_obj_from_addrs(addr_long, addr_short)
         if device_obj:
             device_obj.set_attributes(attributes)
+            if 'type' in attributes:
+                self._outbound.handshake_complete(addr_long)
+            if self._registry and attributes:
+                self._registry.update(device_obj)
+            if attributes:
+                self.events.publish(device_obj.id, attributes, cluster_id)
+
+    def subscribe(self, callback, device_ids=None, attributes=None, clusters=None, maxlen=100, policy='drop'):
+        """
+        Subscribe to device attribute changes.
+        Unlike the Node callback, subscribers are called from the event bus
+        workers, not the XBee reader thread, so they may be slow.
+
+        :param callback: Function called with each event dict (device_id, cluster, attributes, timestamp)
+        :param device_ids: Optional list of Dotted MAC Addresses
+        :param attributes: Optional list of attribute names
+        :param clusters: Optional list of Cluster IDs
+        :param maxlen: Maximum number of pending events for this subscriber
+        :param policy: 'drop' new events or keep the 'latest' when the queue is full
+        :return: Subscription, pass to unsubscribe()
+        """
+        return self.events.subscribe(callback, device_ids, attributes, clusters, maxlen, policy)
+
+    def unsubscribe(self, subscription):
+        """
+        Unsubscribe from device attribute changes.
+
+        :param subscription: Subscription returned by subscribe()
+        """
+        self.events.unsubscribe(subscription)
 
     def send_type_request(self, device_obj):
         """
         Send Type Request.
+        Requests are queued, only the latest pending request per device is sent.
 
         :param device_obj:
         """
         message = self.generate_message('version_info_request')
         addresses = device_obj.addr_tuple
-        self.send_message(message, *addresses)
+        self._outbound.submit('version_info_request', message, *addresses)
 
     def send_switch_state_request(self, device_obj, state):
         """
         Send Relay State Request.
+        Requests are queued, only the latest pending request per device is sent.
 
         :param device_obj:
         :param state:
         """
         message = self.generate_message('switch_state_request', {'switch_state': state})
         addresses = device_obj.addr_tuple
-        self.send_message(message, *addresses)
+        self._outbound.submit('switch_state_request', message, *addresses)
 
     def send_mode_request(self, device_obj, mode):
         """
         Send Mode Request.
+        Requests are queued, only the latest pending request per device is sent.
 
         :param device_obj:
         :param mode:
         """
         message = self.generate_message('mode_change_request', {'mode': mode})
         addresses = device_obj.addr_tuple
-        self.send_message(message, *addresses)
+        self._outbound.submit('mode_change_request', message, *addresses)
 
     def call_device_command(self, device_id, command, value):
         """
@@ -197,3 +303,92 @@ class ZBHub(ZBNode):
             self.send_mode_request(device_obj, value)
         else:
             self._logger.error('Invalid Attribute Request')
+
+    def add_group(self, group_name, device_ids):
+        """
+        Add (or replace) a named group of devices.
+
+        :param group_name: Group Name
+        :param device_ids: List of Dotted MAC Addresses
+        """
+        self.groups[group_name] = list(device_ids)
+
+    def remove_group(self, group_name):
+        """
+        Remove a named group of devices.
+
+        :param group_name: Group Name
+        """
+        self.groups.pop(group_name, None)
+
+    def call_group_command(self, group_name, command, value, pace=0.05, broadcast=False):
+        """
+        Send a command to every device in a named group.
+        See call_devices_command().
+
+        :param group_name: Group Name
+        :param command: Parameter or command to be sent
+        :param value: Value, State, Mode
+        :param pace: Seconds between unicasts
+        :param broadcast: Send a single broadcast rather than unicasts
+        :return: Dictionary of per device results and elapsed time
+        """
+        if group_name not in self.groups:
+            raise Exception("Group '%s' does not exist" % group_name)
+
+        return self.call_devices_command(self.groups[group_name], command, value, pace, broadcast)
+
+    def call_devices_command(self, device_ids, command, value, pace=0.05, broadcast=False):
+        """
+        Send a command to many devices.
+        The message is generated once and then unicast to each device in turn,
+        pacing the sends so we do not flood the radio. Any older pending command
+        of the same type for these devices is dropped from the outbound queue.
+
+        With broadcast=True a single broadcast is sent instead. Broadcasts are
+        not acknowledged and reach every device on the network listening on the
+        AlertMe endpoint, not just the devices listed, so only use this when the
+        command should go to all devices.
+
+        :param device_ids: List of Dotted MAC Addresses
+        :param command: Parameter or command to be sent
+        :param value: Value, State, Mode
+        :param pace: Seconds between unicasts
+        :param broadcast: Send a single broadcast rather than unicasts
+        :return: Dictionary of per device results ('sent', 'broadcast', 'unknown device' or 'error: ...') and elapsed time
+        """
+        if command not in device_commands:
+            raise Exception("Invalid Command '%s'" % command)
+
+        started = time.time()
+        message_id = device_commands[command]
+        message = self.generate_message(message_id, {command: value})
+        results = {}
+
+        if broadcast:
+            self.send_message(dict(message), BROADCAST_LONG, BROADCAST_SHORT)
+            for device_id in device_ids:
+                results[device_id] = 'broadcast'
+
+        else:
+            for i, device_id in enumerate(device_ids):
+                device_obj = self.device_obj_from_id(device_id)
+                if not device_obj:
+                    results[device_id] = 'unknown device'
+                    continue
+
+                if i and pace:
+                    time.sleep(pace)
+
+                self._outbound.discard(message_id, device_obj.addr_long)
+                try:
+                    self.send_message(dict(message), *device_obj.addr_tuple)
+                    results[device_id] = 'sent'
+                except Exception as e:
+                    self._logger.error('Unable to send %s to %s: %s', message_id, device_id, e)
+                    results[device_id] = 'error: %s' % e
+
+        elapsed = time.time() - started
+        self._logger.info('Sent %s to %s devices in %.3fs', command, len(device_ids), elapsed)
+
+        return {'results': results, 'elapsed': elapsed}
@@ -10,6 +10,9 @@ from xbee import ZigBee
 import copy
 import struct
 import pprint
+import binascii
+import json
+import os
 
 # ZigBee Addressing
 BROADCAST_LONG  = b'\x00\x00\x00\x00\x00\x00\xff\xff'
@@ -317,12 +320,13 @@ class ZBNode(Node):
     """
     ZigBee Node object.
     """
-    def __init__(self, serial, callback=None):
+    def __init__(self, serial, callback=None, address_cache=None):
         """
         ZigBee Node Constructor.
 
         :param serial: Serial Object
         :param callback: Optional
+        :param address_cache: Optional JSON file caching own addresses by serial port
         """
         Node.__init__(self, callback)
 
@@ -333,17 +337,30 @@ class ZBNode(Node):
         self.manu_string = 'PyAlertMe'
         self.manu_date = '2017-01-01'
 
-        # Start up Serial and ZigBee
-        self._serial = serial
-        self._xbee = ZigBee(ser=self._serial, callback=self.receive_message, error_callback=self.xbee_error, escaped=True)
+        # Optional Frame Recorder (see capture.py)
+        self._recorder = None
 
-        # My addresses
+        # My addresses, addresses_ready is set once both are known (possibly from
+        # the cache), addresses_confirmed once the XBee has answered MY, SH and SL.
         self.addr_long = None
         self.addr_short = None
-
-        # Fire off messages to discover own addresses
+        self.addresses_ready = threading.Event()
+        self.addresses_confirmed = threading.Event()
         self._addr_long_list = [b'', b'']
-        self.read_addresses()
+        self._addr_answered = set()
+        self._address_cache = address_cache
+        self._cached_addresses = None
+
+        # Start up Serial and ZigBee
+        self._serial = serial
+        self._xbee = ZigBee(ser=self._serial, callback=self.receive_message, error_callback=self.xbee_error, escaped=True)
+
+        # Use cached addresses if we have them, then fire off messages to discover
+        # (or confirm) own addresses in the background so we do not wait on the
+        # AT command round trips.
+        self.load_cached_addresses()
+        self._address_thread = threading.Thread(target=self.read_addresses)
+        self._address_thread.start()
 
         # Scheduler Thread
         self._started = True
@@ -389,6 +406,7 @@ class ZBNode(Node):
         """
         self._started = False         # This should kill the updates thread
         self._schedule_thread.join()  # Wait for updates thread to finish
+        self._address_thread.join()
         self._xbee.halt()
         self._serial.close()
 
@@ -456,6 +474,16 @@ class ZBNode(Node):
         """
         self._logger.critical('XBee Error: %s', error)
 
+    def set_recorder(self, recorder):
+        """
+        Set Frame Recorder.
+        All frames received and sent will be passed to the recorder.
+        To stop recording call set_recorder(None) before closing the recorder.
+
+        :param recorder: FrameRecorder, or None to stop recording
+        """
+        self._recorder = recorder
+
     def read_addresses(self):
         """
         Work out own address.
@@ -469,6 +497,93 @@ class ZBNode(Node):
         self._xbee.send('at', command='SL')
         time.sleep(0.05)
 
+    def wait_for_addresses(self, timeout=None):
+        """
+        Block until own addresses are known.
+
+        :param timeout: Seconds to wait, None to wait forever
+        :return: True if addresses are known
+        """
+        return self.addresses_ready.wait(timeout)
+
+    def _cache_key(self):
+        """
+        Address cache key, the serial port name.
+
+        :return: Serial port name
+        """
+        return str(getattr(self._serial, 'port', None) or getattr(self._serial, 'name', ''))
+
+    def load_cached_addresses(self):
+        """
+        Load own addresses from the address cache, if there is one.
+
+        :return: True if cached addresses were found
+        """
+        if not self._address_cache or not os.path.exists(self._address_cache):
+            return False
+
+        try:
+            with open(self._address_cache) as f:
+                cached = json.load(f).get(self._cache_key())
+        except (IOError, OSError, ValueError) as e:
+            self._logger.warning('Unable to read address cache %s: %s', self._address_cache, e)
+            return False
+
+        if not cached:
+            return False
+
+        self.addr_long = binascii.unhexlify(cached['addr_long'])
+        self.addr_short = binascii.unhexlify(cached['addr_short'])
+        self._cached_addresses = self.addr_tuple
+        self.addresses_ready.set()
+        self._logger.debug('Using cached addresses for %s', self._cache_key())
+        return True
+
+    def _confirm_addresses(self):
+        """
+        Called once the XBee has answered MY, SH and SL.
+        Checks the addresses against the cache and updates it.
+
+        """
+        if self._cached_addresses and self._cached_addresses != self.addr_tuple:
+            self._logger.warning('Own addresses %s differ from the cached addresses for %s',
+                                 self.id, self._cache_key())
+        self.addresses_confirmed.set()
+        self.addresses_ready.set()
+        self.save_cached_addresses()
+
+    def save_cached_addresses(self):
+        """
+        Save own addresses to the address cache, if there is one.
+
+        """
+        if not self._address_cache:
+            return
+
+        cache = {}
+        try:
+            with open(self._address_cache) as f:
+                cache = json.load(f)
+        except (IOError, OSError, ValueError):
+            pass
+
+        entry = {
+            'addr_long': binascii.hexlify(self.addr_long).decode(),
+            'addr_short': binascii.hexlify(self.addr_short).decode()
+        }
+        if cache.get(self._cache_key()) == entry:
+            return
+
+        cache[self._cache_key()] = entry
+        tmp_file = self._address_cache + '.tmp'
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(cache, f)
+            os.rename(tmp_file, self._address_cache)
+        except (IOError, OSError) as e:
+            self._logger.warning('Unable to write address cache %s: %s', self._address_cache, e)
+
     def send_message(self, message, dest_addr_long, dest_addr_short):
         """
         Send message to XBee.
@@ -482,6 +597,9 @@ class ZBNode(Node):
         message['dest_addr_long'] = dest_addr_long
         message['dest_addr'] = dest_addr_short
 
+        if self._recorder:
+            self._recorder.record_sent(message)
+
         self._logger.debug('Sending Message: %s', message)
         self._xbee.send('tx_explicit', **message)
 
@@ -494,6 +612,9 @@ class ZBNode(Node):
         :param message: Dict of message
         :return:
         """
+        if self._recorder:
+            self._recorder.record_received(message)
+
         ret = self.parse_message(message)
 
         if message['id'] == 'rx_explicit':
@@ -512,7 +633,7 @@ class ZBNode(Node):
                 time.sleep(0.5)
 
             # Update any attributes which may need updating
-            self.process_message(source_addr_long, source_addr_short, ret['attributes'])
+            self.process_message(source_addr_long, source_addr_short, ret['attributes'], message['cluster'])
 
     def parse_message(self, message):
         """
@@ -547,6 +668,11 @@ class ZBNode(Node):
             # If we have worked out both the High and Low addresses then calculate the full addr_long
             if self._addr_long_list[0] and self._addr_long_list[1]:
                 self.addr_long = b''.join(self._addr_long_list)
+            # Only once all three have answered are our addresses confirmed
+            if message['command'] in ('MY', 'SH', 'SL'):
+                self._addr_answered.add(message['command'])
+                if len(self._addr_answered) == 3 and not self.addresses_confirmed.is_set():
+                    self._confirm_addresses()
 
         # ZigBee Explicit Packets
         if message['id'] == 'rx_explicit':
@@ -756,13 +882,14 @@ class ZBNode(Node):
 
             return {'attributes': attributes, 'replies': replies}
 
-    def process_message(self, addr_long, addr_short, attributes):
+    def process_message(self, addr_long, addr_short, attributes, cluster_id=None):
         """
         Process after message received. Stub, to be overwritten by ZBHub or ZBDevice.
 
         :param addr_long: Short Address
         :param addr_short: Long Address
         :param attributes: Dict of message
+        :param cluster_id: Cluster ID the message arrived on
         :return:
         """
         self._logger.debug('[STUB] process_message: %s', attributes)
@@ -6,14 +6,15 @@ class ZBSensor(ZBDevice):
     """
     ZigBee Sensor object.
     """
-    def __init__(self, serial, callback=None):
+    def __init__(self, serial, callback=None, address_cache=None):
         """
         Sensor Constructor.
 
         :param serial: Serial Object
         :param callback: Optional
+        :param address_cache: Optional JSON file caching own addresses by serial port
         """
-        ZBDevice.__init__(self, serial, callback)
+        ZBDevice.__init__(self, serial, callback, address_cache)
 
         # Type Info
         self.type = 'ZBSensor'
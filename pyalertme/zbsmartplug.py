@@ -7,14 +7,15 @@ class ZBSmartPlug(ZBDevice):
     """
     ZigBee SmartPlug object.
     """
-    def __init__(self, serial, callback=None):
+    def __init__(self, serial, callback=None, address_cache=None):
         """
         SmartPlug Constructor.
 
         :param serial: Serial Object
         :param callback: Optional
+        :param address_cache: Optional JSON file caching own addresses by serial port
         """
-        ZBDevice.__init__(self, serial, callback)
+        ZBDevice.__init__(self, serial, callback, address_cache)
 
         # Type Info
         self.type = 'ZBSmartPlug'
@@ -0,0 +1,43 @@
+#!/usr/bin/python
+# coding: utf-8
+
+# Filename:    api-example.py
+# Description: Serve the PyAlertMe HTTP API for a Hub
+# Author:      James Saunders [james@saunders-family.net]
+# Copyright:   Copyright (C) 2017 James Saunders
+# License:     MIT
+
+import sys
+sys.path.insert(0, '../')
+import serial
+from pyalertme import *
+import logging
+
+logger = logging.getLogger('pyalertme')
+logger.setLevel(logging.DEBUG)
+
+# Specify log message format
+formatter = logging.Formatter('%(asctime)s %(levelname)-3s %(module)-5s %(message)s')
+
+# Create console handler and set level to info
+sh = logging.StreamHandler()
+sh.setLevel(logging.INFO)
+sh.setFormatter(formatter)
+logger.addHandler(sh)
+
+# Serial Configuration
+XBEE_PORT = '/dev/ttyUSB0'
+XBEE_BAUD = 9600
+ser = serial.Serial(XBEE_PORT, XBEE_BAUD)
+
+# Create Hub Object and API
+hub_obj = ZBHub(ser)
+api = HubApi(hub_obj)
+
+try:
+    api.serve('', 8000)
+except KeyboardInterrupt:
+    pass
+finally:
+    api.halt()
+    hub_obj.halt()
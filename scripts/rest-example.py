@@ -9,9 +9,11 @@
 
 import sys
 sys.path.insert(0, '../')
-from flask import Flask, jsonify, abort, make_response, request
+from flask import Flask, Response, jsonify, abort, make_response, request
 import serial
 from pyalertme import *
+import binascii
+import json
 import logging
 import pprint
 
@@ -39,8 +41,10 @@ XBEE_PORT = '/dev/tty.usbserial-DN018OI6' # MacBook Serial Port
 XBEE_BAUD = 9600
 ser = serial.Serial(XBEE_PORT, XBEE_BAUD)
 
-hub_obj = ZBHub()
-hub_obj.start(ser)
+hub_obj = ZBHub(ser)
+
+# Attribute changes, numbered so stream clients can resume
+feed = ChangeFeed(hub_obj)
 
 app = Flask(__name__)
 app.config['JSON_AS_ASCII'] = True
@@ -60,16 +64,17 @@ def not_found(error):
 @app.route(API_BASE + '/nodes', methods=['GET'])
 def get_nodes():
     nodes = hub_obj.list_devices()
-    for id, node in nodes.iteritems():
+    for id, node in nodes.items():
         nodes[id]['AddressLong'] = ''
         nodes[id]['AddressShort'] = ''
     return jsonify({'Nodes': nodes})
 
-@app.route(API_BASE + '/nodes/<int:node_id>', methods=['GET'])
+@app.route(API_BASE + '/nodes/<node_id>', methods=['GET'])
 def get_node(node_id):
     node = hub_obj.device_obj_from_id(node_id)
 
     if node:
+        node = HubApi.device_dict(node)
         # Blank out the addresses for now
         node['AddressLong'] = ''
         node['AddressShort'] = ''
@@ -77,37 +82,73 @@ def get_node(node_id):
     else:
         abort(404)
 
-@app.route(API_BASE + '/history/<int:node_id>', methods=['GET'])
+@app.route(API_BASE + '/history/<node_id>', methods=['GET'])
 def attribute_history(node_id):
-    attrib_name = 'PowerFactor'
-    history = hub_obj.get_node_attribute_history(node_id, attrib_name, 338083200, 1537228800)
-    return jsonify(history)
-
-@app.route(API_BASE + '/nodes/<int:node_id>', methods=['PUT'])
+    # Only the changes still held by the change feed are available here,
+    # see pyalertme.api for the full API.
+    attrib_name = request.args.get('attribute', 'power_demand')
+    ret = feed.since(0, [node_id], [attrib_name])
+    history = [[change['timestamp'], change['attributes'][attrib_name]] for change in ret['changes']]
+    return jsonify({'history': history})
+
+@app.route(API_BASE + '/nodes/<node_id>', methods=['PUT'])
 def update_node(node_id):
     # If the request is not JSON error 400 Bad Request
-    if not request.json or not request.json['Nodes'][0].has_key('Attributes'):
+    if not request.json or 'Attributes' not in request.json['Nodes'][0]:
         abort(400)
 
     node = hub_obj.device_obj_from_id(node_id)
+    if not node:
+        abort(404)
 
     # Loop round attribute update request updating values
     for attribute in request.json['Nodes'][0]['Attributes']:
-        if node['Attributes'].has_key(attribute):
+        if hasattr(node, attribute):
             for key in request.json['Nodes'][0]['Attributes'][attribute]:
                 value = request.json['Nodes'][0]['Attributes'][attribute][key]
                 hub_obj.call_device_command(node_id, attribute, value)
         else:
             abort(404)
 
+    node = HubApi.device_dict(node)
     node['AddressLong'] = ''
     node['AddressShort'] = ''
     return jsonify(node), 200
 
+@app.route(API_BASE + '/stream', methods=['GET'])
+def stream():
+    # Server-Sent Events stream of attribute changes. Clients may filter with
+    # ?device=<id>&attribute=<name> (both repeatable). On reconnect the browser
+    # sends Last-Event-ID and we resume from there, if the changes have been
+    # dropped a 'reset' event tells the client to reload /nodes first.
+    device_ids = request.args.getlist('device') or None
+    attributes = request.args.getlist('attribute') or None
+    seq = int(request.headers.get('Last-Event-ID') or request.args.get('since') or feed.seq)
+
+    def events(seq):
+        while True:
+            ret = feed.wait(seq, 15, device_ids, attributes)
+            if ret['reset']:
+                yield 'event: reset\ndata: {}\n\n'
+            for change in ret['changes']:
+                data = {
+                    'device_id': change['device_id'],
+                    'cluster': binascii.hexlify(change['cluster']).decode() if change['cluster'] else None,
+                    'attributes': change['attributes'],
+                    'timestamp': change['timestamp']
+                }
+                yield 'id: %s\ndata: %s\n\n' % (change['seq'], json.dumps(data))
+            if ret['seq'] == seq:
+                # Keep alive
+                yield ': \n\n'
+            seq = ret['seq']
+
+    return Response(events(seq), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
 @app.route(API_BASE + '/discovery', methods=['POST'])
 def discovery():
     hub_obj.discovery()
     return jsonify({'discovery': 1})
 
 if __name__ == '__main__':
-    app.run(debug=True, use_reloader=False)
\ No newline at end of file
+    app.run(debug=True, use_reloader=False, threaded=True)
\ No newline at end of file
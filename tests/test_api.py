@@ -0,0 +1,140 @@
+#! /usr/bin/python
+"""
+test_api.py
+
+By James Saunders, 2017
+
+Tests PyAlertMe Module.
+"""
+import sys
+sys.path.insert(0, '../')
+from pyalertme import *
+import io
+import json
+import time
+import unittest
+from mock_serial import Serial
+
+
+class TestHubApi(unittest.TestCase):
+    """
+    Test PyAlertMe HubApi Class.
+    """
+    def setUp(self):
+        """
+        Create a hub with some devices, and an API, for each test.
+        """
+        self.hub_obj = ZBHub(Serial())
+        self.hub_obj.addr_long = b'\x00\x1e\x5e\x09\x02\x14\xc5\xab'
+        self.sent = []
+        self.hub_obj.send_message = lambda *args: self.sent.append(args)
+        for i in range(3):
+            self.hub_obj.process_message(b'\x00\x0d\x6f\x00\x00\x00\x00' + bytearray([i]), b'\x00\x00', {'power_demand': i})
+        self.api = HubApi(self.hub_obj, page_size=2)
+
+    def tearDown(self):
+        """
+        Halt API and hub.
+        """
+        self.api.halt()
+        self.hub_obj.halt()
+
+    def request(self, method, path, body=None, headers=None):
+        """
+        Call the WSGI application.
+        """
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': '/api/v1' + path.split('?')[0],
+            'QUERY_STRING': path.split('?')[1] if '?' in path else '',
+            'CONTENT_LENGTH': str(len(payload)),
+            'wsgi.input': io.BytesIO(payload)
+        }
+        environ.update(headers or {})
+        response = {}
+
+        def start_response(status, response_headers):
+            response['status'] = int(status.split()[0])
+            response['headers'] = dict(response_headers)
+
+        content = b''.join(self.api(environ, start_response))
+        response['body'] = json.loads(content.decode('utf-8')) if content else None
+
+        return response
+
+    def wait_for_job(self, job_id):
+        """
+        Wait for a job to finish.
+        """
+        for i in range(100):
+            job = self.request('GET', '/jobs/%s' % job_id)['body']
+            if job['status'] in ('done', 'failed'):
+                return job
+            time.sleep(0.01)
+
+    def test_list_devices(self):
+        """
+        Test device listing is paginated and has an ETag.
+        """
+        response = self.request('GET', '/devices')
+        self.assertEqual(response['status'], 200)
+        self.assertEqual([device['id'] for device in response['body']['devices']], ['00:0d:6f:00:00:00:00:00', '00:0d:6f:00:00:00:00:01'])
+        self.assertEqual(response['body']['devices'][0]['addr_long'], '000d6f0000000000')
+        self.assertEqual(response['body']['total'], 3)
+        self.assertEqual(response['body']['next'], 2)
+
+        response = self.request('GET', '/devices?offset=2')
+        self.assertEqual([device['id'] for device in response['body']['devices']], ['00:0d:6f:00:00:00:00:02'])
+        self.assertEqual(response['body']['next'], None)
+
+        etag = response['headers']['ETag']
+        self.assertEqual(self.request('GET', '/devices', headers={'HTTP_IF_NONE_MATCH': etag})['status'], 304)
+        self.assertEqual(self.request('GET', '/devices?limit=x')['status'], 400)
+
+    def test_get_device(self):
+        """
+        Test single device ETags change when the device changes.
+        """
+        response = self.request('GET', '/devices/00:0d:6f:00:00:00:00:01')
+        self.assertEqual(response['body']['power_demand'], 1)
+        etag = response['headers']['ETag']
+        self.assertEqual(self.request('GET', '/devices/00:0d:6f:00:00:00:00:01', headers={'HTTP_IF_NONE_MATCH': etag})['status'], 304)
+
+        self.hub_obj.process_message(b'\x00\x0d\x6f\x00\x00\x00\x00\x01', b'\x00\x00', {'power_demand': 50})
+        self.api.feed.wait(self.api.feed.seq, 5)
+        response = self.request('GET', '/devices/00:0d:6f:00:00:00:00:01', headers={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(response['status'], 200)
+        self.assertEqual(response['body']['power_demand'], 50)
+
+        history = self.request('GET', '/devices/00:0d:6f:00:00:00:00:01/history?attribute=power_demand')['body']['history']
+        self.assertEqual(history[-1]['attributes'], {'power_demand': 50})
+
+        self.assertEqual(self.request('GET', '/devices/00:0d:6f:00:00:00:00:09')['status'], 404)
+        self.assertEqual(self.request('DELETE', '/devices/00:0d:6f:00:00:00:00:01')['status'], 405)
+
+    def test_commands(self):
+        """
+        Test single and bulk commands return jobs.
+        """
+        del self.sent[:]
+        response = self.request('POST', '/devices/00:0d:6f:00:00:00:00:01/commands', {'command': 'switch_state', 'value': 1})
+        self.assertEqual(response['status'], 202)
+        job = self.wait_for_job(response['body']['job_id'])
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['result']['results'], {'00:0d:6f:00:00:00:00:01': 'sent'})
+
+        self.hub_obj.add_group('all', ['00:0d:6f:00:00:00:00:00', '00:0d:6f:00:00:00:00:02'])
+        response = self.request('POST', '/commands', {'group': 'all', 'command': 'switch_state', 'value': 0})
+        job = self.wait_for_job(response['body']['job_id'])
+        self.assertEqual(len(job['result']['results']), 2)
+        self.assertEqual(len(self.sent), 3)
+
+        self.assertEqual(self.request('POST', '/commands', {'command': 'switch_state', 'value': 0})['status'], 400)
+        self.assertEqual(self.request('POST', '/commands', {'group': 'none', 'command': 'switch_state', 'value': 0})['status'], 404)
+        self.assertEqual(self.request('POST', '/devices/00:0d:6f:00:00:00:00:01/commands', {'command': 'explode', 'value': 1})['status'], 400)
+        self.assertEqual(self.request('GET', '/jobs/999')['status'], 404)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,124 @@
+#! /usr/bin/python
+"""
+test_capture.py
+
+By James Saunders, 2017
+
+Tests PyAlertMe Module.
+"""
+import sys
+sys.path.insert(0, '../')
+from pyalertme import *
+import os
+import shutil
+import tempfile
+import unittest
+from mock_serial import Serial
+
+
+class TestCapture(unittest.TestCase):
+    """
+    Test PyAlertMe Frame Capture and Replay.
+    """
+    def setUp(self):
+        """
+        Create a hub object and capture file for each test.
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp_dir, 'capture.bin')
+
+        self.hub_ser = Serial()
+        self.hub_obj = ZBHub(self.hub_ser)
+        self.hub_obj.addr_long = b'\x00\x1e\x5e\x09\x02\x14\xc5\xab'
+        self.hub_obj.addr_short = b'\x88\xd2'
+
+        self.power_message = {
+            'profile': b'\xc2\x16',
+            'source_addr': b'\x88\x9f',
+            'dest_endpoint': b'\x02',
+            'rf_data': b'\tj\x81%\x00',
+            'source_endpoint': b'\x02',
+            'options': b'\x01',
+            'source_addr_long': b'\x00\ro\x00\x03\xbb\xb9\xf8',
+            'cluster': b'\x00\xef',
+            'id': 'rx_explicit'
+        }
+
+    def tearDown(self):
+        """
+        Teardown hub object and capture file.
+        """
+        self.hub_obj.halt()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_record_and_replay(self):
+        """
+        Test frames recorded from a hub replay into a second hub.
+        """
+        at_message = {'status': b'\x00', 'frame_id': b'\x05', 'parameter': b'\x88\x9f', 'command': 'MY', 'id': 'at_response'}
+        recorder = FrameRecorder(self.filename)
+        self.hub_obj.set_recorder(recorder)
+        self.hub_obj.receive_message(at_message)
+        self.hub_obj.receive_message(self.power_message)
+        self.hub_obj.set_recorder(None)
+        recorder.close()
+
+        replayer = FrameReplayer(self.filename)
+        records = list(replayer.records())
+        directions = [record[1] for record in records]
+        # Two received frames plus the mode and version requests sent to the new device.
+        self.assertEqual(directions, [0, 0, 1, 1])
+        self.assertEqual(FrameReplayer.to_message(records[0]), at_message)
+        self.assertEqual(FrameReplayer.to_message(records[1]), self.power_message)
+
+        replay_obj = ZBHub(Serial())
+        replay_obj.addr_long = b'\x00\x1e\x5e\x09\x02\x14\xc5\xab'
+        try:
+            stats = replayer.replay(replay_obj, speed=None)
+        finally:
+            replayer.close()
+            replay_obj.halt()
+
+        self.assertEqual(stats['frames'], 2)
+        self.assertEqual(stats['bytes'], 7)
+        self.assertEqual(replay_obj.addr_short, b'\x88\x9f')
+        self.assertEqual(replay_obj.devices['00:0d:6f:00:03:bb:b9:f8'].power_demand, 37)
+
+    def test_optional_keys(self):
+        """
+        Test keys missing from the received message are not added on replay.
+        """
+        del self.power_message['options']
+        recorder = FrameRecorder(self.filename)
+        recorder.record_received(self.power_message)
+        recorder.record_received({'parameter': b'\x88\x9f', 'command': 'MY', 'id': 'at_response'})
+        recorder.close()
+
+        # A closed recorder ignores any further frames.
+        recorder.record_received(self.power_message)
+
+        replayer = FrameReplayer(self.filename)
+        messages = [FrameReplayer.to_message(record) for record in replayer.records()]
+        replayer.close()
+        self.assertEqual(messages, [
+            self.power_message,
+            {'parameter': b'\x88\x9f', 'command': 'MY', 'id': 'at_response'}
+        ])
+
+    def test_invalid_file(self):
+        """
+        Test replaying a file which is not a capture.
+        """
+        with open(self.filename, 'wb') as f:
+            f.write(b'NOTACAPTURE')
+        self.assertRaises(Exception, FrameReplayer, self.filename)
+
+        # Empty and short files get the same error.
+        for content in (b'', b'PYAM'):
+            with open(self.filename, 'wb') as f:
+                f.write(content)
+            self.assertRaises(Exception, FrameReplayer, self.filename)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,89 @@
+#! /usr/bin/python
+"""
+test_changefeed.py
+
+By James Saunders, 2017
+
+Tests PyAlertMe Module.
+"""
+import sys
+sys.path.insert(0, '../')
+from pyalertme import *
+import threading
+import unittest
+from mock_serial import Serial
+
+
+class TestChangeFeed(unittest.TestCase):
+    """
+    Test PyAlertMe ChangeFeed Class.
+    """
+    def setUp(self):
+        """
+        Create a change feed, without a hub, for each test.
+        """
+        self.feed = ChangeFeed(maxlen=3)
+
+    def append(self, device_id, attributes):
+        return self.feed.append({'device_id': device_id, 'cluster': None, 'attributes': attributes, 'timestamp': 0})
+
+    def test_resume(self):
+        """
+        Test resuming from a sequence number, with filters.
+        """
+        self.assertEqual(self.append('00:0d:6f:00:00:00:00:01', {'power_demand': 10, 'switch_state': 1}), 1)
+        self.append('00:0d:6f:00:00:00:00:02', {'power_demand': 20})
+
+        ret = self.feed.since(0)
+        self.assertEqual([change['seq'] for change in ret['changes']], [1, 2])
+        self.assertEqual(ret['seq'], 2)
+        self.assertFalse(ret['reset'])
+
+        ret = self.feed.since(1, attributes=['switch_state'])
+        self.assertEqual(ret['changes'], [])
+        ret = self.feed.since(0, device_ids=['00:0d:6f:00:00:00:00:01'], attributes=['switch_state'])
+        self.assertEqual(ret['changes'][0]['attributes'], {'switch_state': 1})
+        self.assertEqual(self.feed.versions, {'00:0d:6f:00:00:00:00:01': 1, '00:0d:6f:00:00:00:00:02': 2})
+
+    def test_reset(self):
+        """
+        Test a client which has missed changes is told to reset.
+        """
+        for power_demand in range(5):
+            self.append('00:0d:6f:00:00:00:00:01', {'power_demand': power_demand})
+        self.assertTrue(self.feed.since(1)['reset'])
+        self.assertFalse(self.feed.since(2)['reset'])
+        self.assertEqual(len(self.feed.since(2)['changes']), 3)
+
+    def test_wait(self):
+        """
+        Test waiting for the next change.
+        """
+        self.assertEqual(self.feed.wait(0, 0.01)['changes'], [])
+        timer = threading.Timer(0.05, self.append, ('00:0d:6f:00:00:00:00:01', {'power_demand': 1}))
+        timer.start()
+        ret = self.feed.wait(0, 5)
+        timer.join()
+        self.assertEqual(ret['seq'], 1)
+
+    def test_hub_feed(self):
+        """
+        Test the feed follows a hub's attribute changes.
+        """
+        hub_obj = ZBHub(Serial())
+        try:
+            hub_obj.addr_long = b'\x00\x1e\x5e\x09\x02\x14\xc5\xab'
+            hub_obj.send_message = lambda *args: None
+            feed = ChangeFeed(hub_obj)
+            hub_obj.process_message(b'\x00\ro\x00\x03\xbb\xb9\xf8', b'\x88\x9f', {'power_demand': 37}, b'\x00\xef')
+            ret = feed.wait(0, 5)
+            feed.close()
+        finally:
+            hub_obj.halt()
+
+        self.assertEqual(ret['changes'][0]['attributes'], {'power_demand': 37})
+        self.assertEqual(ret['changes'][0]['cluster'], b'\x00\xef')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,128 @@
+#! /usr/bin/python
+"""
+test_eventbus.py
+
+By James Saunders, 2017
+
+Tests PyAlertMe Module.
+"""
+import sys
+sys.path.insert(0, '../')
+from pyalertme import *
+import threading
+import unittest
+from mock_serial import Serial
+
+
+class TestEventBus(unittest.TestCase):
+    """
+    Test PyAlertMe EventBus Class.
+    """
+    def setUp(self):
+        """
+        Create an event bus, without workers, for each test.
+        """
+        self.bus = EventBus()
+        self.events = []
+
+    def test_filters(self):
+        """
+        Test subscribers only receive matching events.
+        """
+        all_sub = self.bus.subscribe(self.events.append)
+        device_sub = self.bus.subscribe(self.events.append, device_ids=['00:0d:6f:00:00:00:00:01'])
+        attr_sub = self.bus.subscribe(self.events.append, attributes=['switch_state'])
+        cluster_sub = self.bus.subscribe(self.events.append, clusters=[b'\x00\xee'])
+
+        self.bus.publish('00:0d:6f:00:00:00:00:01', {'power_demand': 10}, b'\x00\xef')
+        self.bus.publish('00:0d:6f:00:00:00:00:02', {'switch_state': 1, 'power_demand': 0}, b'\x00\xee')
+
+        self.assertEqual(all_sub.pending(), 2)
+        self.assertEqual(device_sub.pending(), 1)
+        self.assertEqual(attr_sub.pending(), 1)
+        self.assertEqual(cluster_sub.pending(), 1)
+
+        # Attribute filters narrow the event to the requested attributes
+        self.assertEqual(attr_sub._events[0]['attributes'], {'switch_state': 1})
+
+    def test_overflow_policy(self):
+        """
+        Test bounded queues drop new events, or keep only the latest.
+        """
+        drop_sub = self.bus.subscribe(self.events.append, maxlen=2, policy='drop')
+        latest_sub = self.bus.subscribe(self.events.append, maxlen=2, policy='latest')
+        for power_demand in range(5):
+            self.bus.publish('00:0d:6f:00:00:00:00:01', {'power_demand': power_demand})
+
+        self.assertEqual([event['attributes']['power_demand'] for event in drop_sub._events], [0, 1])
+        self.assertEqual([event['attributes']['power_demand'] for event in latest_sub._events], [3, 4])
+        self.assertEqual(drop_sub.dropped, 3)
+        self.assertEqual(latest_sub.dropped, 3)
+        self.assertRaises(Exception, self.bus.subscribe, self.events.append, policy='never')
+
+    def test_slow_subscriber(self):
+        """
+        Test a slow subscriber does not hold up publishing or other subscribers.
+        """
+        release = threading.Event()
+        fast_done = threading.Event()
+
+        def slow(event):
+            release.wait(5)
+
+        def fast(event):
+            self.events.append(event)
+            if len(self.events) == 3:
+                fast_done.set()
+
+        self.bus.start()
+        try:
+            slow_sub = self.bus.subscribe(slow)
+            self.bus.subscribe(fast)
+            for power_demand in range(3):
+                self.bus.publish('00:0d:6f:00:00:00:00:01', {'power_demand': power_demand})
+            self.assertTrue(fast_done.wait(5))
+            self.assertEqual([event['attributes']['power_demand'] for event in self.events], [0, 1, 2])
+        finally:
+            release.set()
+            self.bus.halt()
+        self.assertEqual(slow_sub.delivered, 3)
+
+    def test_hub_publish(self):
+        """
+        Test the hub publishes attribute changes with the cluster they arrived on.
+        """
+        hub_obj = ZBHub(Serial())
+        try:
+            hub_obj.addr_long = b'\x00\x1e\x5e\x09\x02\x14\xc5\xab'
+            hub_obj.send_message = lambda *args: None
+            received = threading.Event()
+
+            def callback(event):
+                self.events.append(event)
+                received.set()
+
+            hub_obj.subscribe(callback, attributes=['power_demand'])
+            message = {
+                'profile': b'\xc2\x16',
+                'source_addr': b'\x88\x9f',
+                'dest_endpoint': b'\x02',
+                'rf_data': b'\tj\x81%\x00',
+                'source_endpoint': b'\x02',
+                'options': b'\x01',
+                'source_addr_long': b'\x00\ro\x00\x03\xbb\xb9\xf8',
+                'cluster': b'\x00\xef',
+                'id': 'rx_explicit'
+            }
+            hub_obj.receive_message(message)
+            self.assertTrue(received.wait(5))
+        finally:
+            hub_obj.halt()
+
+        self.assertEqual(self.events[0]['device_id'], '00:0d:6f:00:03:bb:b9:f8')
+        self.assertEqual(self.events[0]['cluster'], b'\x00\xef')
+        self.assertEqual(self.events[0]['attributes'], {'power_demand': 37})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,77 @@
+#! /usr/bin/python
+"""
+test_outbound.py
+
+By James Saunders, 2017
+
+Tests PyAlertMe Module.
+"""
+import sys
+sys.path.insert(0, '../')
+from pyalertme import *
+import unittest
+from mock_serial import Serial
+
+
+class TestOutboundQueue(unittest.TestCase):
+    """
+    Test PyAlertMe OutboundQueue Class.
+    """
+    def setUp(self):
+        """
+        Create a queue, without the sender thread, for each test.
+        """
+        self.sent = []
+        self.queue = OutboundQueue(lambda *args: self.sent.append(args))
+
+    def test_coalesce(self):
+        """
+        Test only the latest pending command per device and message type is sent.
+        """
+        plug_a = (b'\x00\x0d\x6f\x00\x00\x00\x00\x0a', b'\x00\x0a')
+        plug_b = (b'\x00\x0d\x6f\x00\x00\x00\x00\x0b', b'\x00\x0b')
+        for state in (1, 0, 1, 0):
+            self.queue.submit('switch_state_request', {'state': state}, *plug_a)
+        self.queue.submit('mode_change_request', {'mode': 'normal'}, *plug_a)
+        self.queue.submit('switch_state_request', {'state': 1}, *plug_b)
+        self.assertEqual(self.queue.pending(), 3)
+
+        self.queue.flush()
+        self.assertEqual(self.sent, [
+            ({'state': 0},) + plug_a,
+            ({'mode': 'normal'},) + plug_a,
+            ({'state': 1},) + plug_b
+        ])
+        self.assertEqual(self.queue.coalesced, 3)
+        self.assertEqual(self.queue.sent, 3)
+
+    def test_handshake_cooldown(self):
+        """
+        Test handshakes are not repeated within the cooldown.
+        """
+        addr_long = b'\x00\x0d\x6f\x00\x00\x00\x00\x0a'
+        self.assertTrue(self.queue.handshake_due(addr_long))
+        self.assertFalse(self.queue.handshake_due(addr_long))
+        self.queue.handshake_complete(addr_long)
+        self.assertTrue(self.queue.handshake_due(addr_long))
+
+        self.queue.handshake_cooldown = 0
+        self.assertTrue(self.queue.handshake_due(addr_long))
+
+    def test_hub_handshake(self):
+        """
+        Test a hub only handshakes once with a device which has not yet sent its type.
+        """
+        hub_obj = ZBHub(Serial())
+        try:
+            hub_obj.addr_long = b'\x00\x1e\x5e\x09\x02\x14\xc5\xab'
+            hub_obj.send_message = lambda *args: self.sent.append(args)
+            for i in range(3):
+                hub_obj.process_message(b'\x00\ro\x00\x01r\xf7\x1b', b'\x92T', {'power_demand': i})
+            self.assertEqual(len(self.sent), 2)
+        finally:
+            hub_obj.halt()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,123 @@
+#! /usr/bin/python
+"""
+test_registry.py
+
+By James Saunders, 2017
+
+Tests PyAlertMe Module.
+"""
+import sys
+sys.path.insert(0, '../')
+from pyalertme import *
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from mock_serial import Serial
+
+
+class TestDeviceRegistry(unittest.TestCase):
+    """
+    Test PyAlertMe DeviceRegistry Class.
+    """
+    def setUp(self):
+        """
+        Create a registry file for each test.
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp_dir, 'devices.json')
+        self.hubs = []
+
+    def tearDown(self):
+        """
+        Halt any hubs and remove registry file.
+        """
+        for hub_obj in self.hubs:
+            hub_obj.halt()
+        shutil.rmtree(self.tmp_dir)
+
+    def create_hub(self, flush_interval=5):
+        """
+        Create a hub using the registry file.
+        """
+        hub_obj = ZBHub(Serial(), registry=DeviceRegistry(self.filename, flush_interval))
+        hub_obj.addr_long = b'\x00\x1e\x5e\x09\x02\x14\xc5\xab'
+        hub_obj.addr_short = b'\x88\xd2'
+        self.hubs.append(hub_obj)
+        return hub_obj
+
+    def test_warm_restart(self):
+        """
+        Test devices are restored after a restart and are not re-handshaked.
+        """
+        hub_obj = self.create_hub()
+        message = {
+            'profile': b'\xc2\x16',
+            'source_addr': b'\x92T',
+            'dest_endpoint': b'\x02',
+            'rf_data': b'\t\x00\xfeT\x92\x1b\xf7r\x01\x00o\r\x009\x10\x07\x00\x01(\x00\x01\x0bAlertMe.com\tSmartPlug\n2011-07-25',
+            'source_endpoint': b'\x02',
+            'options': b'\x01',
+            'source_addr_long': b'\x00\ro\x00\x01r\xf7\x1b',
+            'cluster': b'\x00\xf6',
+            'id': 'rx_explicit'
+        }
+        hub_obj.receive_message(message)
+        message['cluster'] = b'\x00\xef'
+        message['rf_data'] = b'\tj\x81%\x00'
+        hub_obj.receive_message(message)
+        hub_obj.halt()
+        self.hubs.remove(hub_obj)
+
+        hub_obj = self.create_hub()
+        sent = []
+        hub_obj.send_message = lambda *args: sent.append(args)
+        device_obj = hub_obj.device_obj_from_id('00:0d:6f:00:01:72:f7:1b')
+        self.assertEqual(device_obj.addr_tuple, (b'\x00\ro\x00\x01r\xf7\x1b', b'\x92T'))
+        self.assertEqual(device_obj.type, 'SmartPlug')
+        self.assertEqual(device_obj.power_demand, 37)
+        self.assertTrue(device_obj.associated)
+
+        hub_obj.receive_message(message)
+        self.assertEqual(sent, [])
+
+    def test_periodic_flush(self):
+        """
+        Test changes are written out without waiting for further frames or halt.
+        """
+        hub_obj = self.create_hub(flush_interval=0.05)
+        hub_obj.process_message(b'\x00\ro\x00\x01r\xf7\x1b', b'\x92T', {'power_demand': 12})
+        time.sleep(0.3)
+        devices = DeviceRegistry(self.filename).load()
+        self.assertEqual(devices['00:0d:6f:00:01:72:f7:1b'].power_demand, 12)
+
+    def test_journal(self):
+        """
+        Test incremental writes, removal and compaction.
+        """
+        registry = DeviceRegistry(self.filename)
+        registry.load()
+        device_obj = Node()
+        device_obj.addr_long = b'\x00\x0d\x6f\x00\x00\x00\xff\xff'
+        device_obj.addr_short = b'\x88\xfd'
+        for power_demand in range(3):
+            device_obj.power_demand = power_demand
+            registry.update(device_obj)
+            registry.flush()
+        registry.update(device_obj)
+        registry.flush()
+        with open(self.filename) as f:
+            self.assertEqual(len(f.readlines()), 3)
+
+        devices = DeviceRegistry(self.filename).load()
+        self.assertEqual(devices['00:0d:6f:00:00:00:ff:ff'].power_demand, 2)
+        with open(self.filename) as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+        registry.remove('00:0d:6f:00:00:00:ff:ff')
+        self.assertEqual(DeviceRegistry(self.filename).load(), {})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
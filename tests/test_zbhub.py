@@ -9,6 +9,8 @@ Tests PyAlertMe Module.
 import sys
 sys.path.insert(0, '../')
 from pyalertme import *
+from pyalertme.zbnode import BROADCAST_LONG, BROADCAST_SHORT
+import struct
 import unittest
 from mock_serial import Serial
 
@@ -123,5 +125,36 @@ class TestZBHub(unittest.TestCase):
         expected = b'~\x00\x17}1\x00\x00}3\xa2\x00@\xa2;\tRK\x02\x02\x00\xf6\xc2\x16\x00\x00}1\x00\xfc\x97'        
         self.assertEqual(result, expected)
 
+    def test_group_command(self):
+        """
+        Test Group Commands.
+        """
+        sent = []
+        self.hub_obj.send_message = lambda *args: sent.append(args)
+        for i in range(3):
+            self.hub_obj.process_message(b'\x00\x0d\x6f\x00\x00\x00\x00' + struct.pack('B', i), b'\x00' + struct.pack('B', i), {'type': 'SmartPlug'})
+        self.hub_obj.add_group('plugs', ['00:0d:6f:00:00:00:00:00', '00:0d:6f:00:00:00:00:01', '00:0d:6f:00:00:00:00:09'])
+        del sent[:]
+
+        result = self.hub_obj.call_group_command('plugs', 'switch_state', 0, pace=0)
+        self.assertEqual(result['results'], {
+            '00:0d:6f:00:00:00:00:00': 'sent',
+            '00:0d:6f:00:00:00:00:01': 'sent',
+            '00:0d:6f:00:00:00:00:09': 'unknown device'
+        })
+        self.assertEqual([args[1:] for args in sent], [
+            (b'\x00\x0d\x6f\x00\x00\x00\x00\x00', b'\x00\x00'),
+            (b'\x00\x0d\x6f\x00\x00\x00\x00\x01', b'\x00\x01')
+        ])
+        self.assertEqual(sent[0][0]['data'], b'\x11\x00\x02\x00\x01')
+
+        del sent[:]
+        result = self.hub_obj.call_group_command('plugs', 'switch_state', 1, broadcast=True)
+        self.assertEqual(set(result['results'].values()), set(['broadcast']))
+        self.assertEqual([args[1:] for args in sent], [(BROADCAST_LONG, BROADCAST_SHORT)])
+
+        self.hub_obj.remove_group('plugs')
+        self.assertRaises(Exception, self.hub_obj.call_group_command, 'plugs', 'switch_state', 1)
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
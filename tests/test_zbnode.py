@@ -9,6 +9,10 @@ Tests PyAlertMe Module.
 import sys
 sys.path.insert(0, '../')
 from pyalertme.zbnode import *
+from pyalertme.zbsmartplug import ZBSmartPlug
+import os
+import shutil
+import tempfile
 import unittest
 from mock_serial import Serial
 
@@ -102,6 +106,55 @@ class TestZBNode(unittest.TestCase):
 
         self.assertEqual(self.node_obj.id, '00:13:a2:00:40:e9:a4:c0')
 
+    def test_address_cache(self):
+        """
+        Test Own Addresses are cached and reused on restart.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        cache_file = os.path.join(tmp_dir, 'addresses.json')
+        nodes = []
+
+        def create_node(port='/dev/null'):
+            node_obj = ZBSmartPlug(Serial(port=port), address_cache=cache_file)
+            nodes.append(node_obj)
+            return node_obj
+
+        def answer(node_obj, command, parameter):
+            node_obj.receive_message({'status': b'\x00', 'frame_id': b'\x01', 'parameter': parameter, 'command': command, 'id': 'at_response'})
+
+        try:
+            node_obj = create_node()
+            self.assertFalse(node_obj.wait_for_addresses(0))
+            answer(node_obj, 'MY', b'\x88\x9f')
+            answer(node_obj, 'SH', b'\x00\x13\xa2\x00')
+            self.assertFalse(node_obj.wait_for_addresses(0))
+            answer(node_obj, 'SL', b'@\xe9\xa4\xc0')
+            self.assertTrue(node_obj.wait_for_addresses(0))
+            self.assertTrue(node_obj.addresses_confirmed.is_set())
+
+            # A restart on the same port is ready straight away, but not yet confirmed.
+            node_obj = create_node()
+            self.assertTrue(node_obj.wait_for_addresses(0))
+            self.assertFalse(node_obj.addresses_confirmed.is_set())
+            self.assertEqual(node_obj.addr_tuple, (b'\x00\x13\xa2\x00@\xe9\xa4\xc0', b'\x88\x9f'))
+
+            # The cache is not rewritten until all three addresses have answered.
+            answer(node_obj, 'MY', b'\x00\x01')
+            answer(node_obj, 'SH', b'\x00\x13\xa2\x00')
+            self.assertEqual(create_node().addr_short, b'\x88\x9f')
+            answer(node_obj, 'SL', b'@\xe9\xa4\xc1')
+            self.assertTrue(node_obj.addresses_confirmed.is_set())
+            self.assertEqual(create_node().addr_tuple, (b'\x00\x13\xa2\x00@\xe9\xa4\xc1', b'\x00\x01'))
+
+            # But a different port is not ready.
+            node_obj = create_node('/dev/ttyUSB1')
+            self.assertFalse(node_obj.wait_for_addresses(0))
+            self.assertEqual(node_obj.addr_long, None)
+        finally:
+            for node_obj in nodes:
+                node_obj.halt()
+            shutil.rmtree(tmp_dir)
+
     def test_get_message(self):
         """
         Test Get Message.